@@ -5,20 +5,18 @@ import tkinter as tk
 import pandas as pd
 # import numpy as np
 import hashlib
-import easyocr
+import json
 import csv
 import cv2
 import os
-import re
 import threading # for _update_relics_csv (GUI pbar) which uses threading to not freeze GUI during video parsing
+import multiprocessing # for extract_relics_sharded, one decoder process per time range
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tkinter import filedialog, Tk # file in
 from pathlib import Path # find file home path
-<<<<<<< HEAD
-
-=======
 from TextNormalizer import TextNormalizer
-normalizer = TextNormalizer("AllRelicNames.txt", "AllRelicAttributes.txt")
->>>>>>> threaded-gui
+from OCRBackends import EasyOCRBackend, TemplateOCRBackend
+from OCRService import OCRClient
 
 # === Constants ===
 VIDEO_NAME = "relics.mp4"
@@ -72,14 +70,64 @@ OUTPUT_CSV = OUTPUT_DIR / "relics.csv"
 DEBUG_DIR = OUTPUT_DIR / "debug_frames"
 DEBUG = False
 FRAME_SKIP = 3
+SHARD_COUNT = 1 # >1 splits the video into N time ranges decoded by parallel processes (each loads its own OCR model), e.g. os.cpu_count()
+NORMALIZE_MEMO = OUTPUT_DIR / "normalize_memo.json" # raw OCR -> matched entry, persists across imports
+OCR_BACKEND = "easyocr" # "easyocr" = model on every crop, "template" = learned line templates with easyocr fallback (experimental)
+OCR_TEMPLATES = OUTPUT_DIR / "ocr_templates.npz"
+PANEL_OCR = False # True = one readtext pass over the whole relic panel, lines assigned to name/slots by y (bypasses OCR_BACKEND)
+FUZZY_CUTOFF = 85 # TextNormalizer match cutoff %
+OCR_SCALE = 1.0 # resize factor applied to crops before easyocr (<1 = faster, less accurate)
+ROI_SCALE = 1.0 # capture height / 1080, ROIS below are in 1080p pixels; set per video in extract_relics
+USE_OCR_SERVICE = True # send crops to a running OCRService.py first, in-process easyocr if it is not up (not used by shards)
 # VIDEO_SHORT_PATH = os.path.join(os.path.basename(os.path.dirname(VIDEO_PATH)), VIDEO_NAME)
 
+# Calibrated overrides for the settings above (written by Calibrate.py)
+IMPORT_PROFILE = OUTPUT_DIR / "import_profile.json"
+PROFILE_KEYS = { # profile key -> (global, check); values failing the check keep the default above
+    "frame_skip":   ("FRAME_SKIP",   lambda v: type(v) is int and v >= 1),
+    "fuzzy_cutoff": ("FUZZY_CUTOFF", lambda v: type(v) in (int, float) and 0 <= v <= 100),
+    "ocr_scale":    ("OCR_SCALE",    lambda v: type(v) in (int, float) and 0 < v <= 4),
+    "panel_ocr":    ("PANEL_OCR",    lambda v: type(v) is bool),
+    "ocr_backend":  ("OCR_BACKEND",  lambda v: v in ("easyocr", "template")),
+}
+
+def load_import_profile(path=IMPORT_PROFILE):
+    try:
+        with open(path, encoding='utf-8') as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(profile, dict):
+        print(f"⚠️ Ignoring import profile '{path}': not a JSON object")
+        return {}
+    valid = {}
+    for key, (_, check) in PROFILE_KEYS.items():
+        if key not in profile:
+            continue
+        if check(profile[key]):
+            valid[key] = profile[key]
+        else:
+            print(f"⚠️ Ignoring invalid '{key}': {profile[key]!r} in import profile '{path}'")
+    return valid
+
+import_profile = load_import_profile()
+for key, value in import_profile.items():
+    globals()[PROFILE_KEYS[key][0]] = value
+if import_profile:
+    print(f"⚙️ Using import profile '{IMPORT_PROFILE}':", import_profile)
+
 print("Looking for CSV at:", os.path.abspath(OUTPUT_CSV))
-reader = easyocr.Reader(['en'], gpu=True)
+reader = None # easyocr.Reader, loaded on first in-process OCR (see get_reader) so service-backed runs never pay for it
+# Shard workers bypass the service: N shards funnelled into its reader pool would lose the parallel speedup
+ocr_client = OCRClient() if USE_OCR_SERVICE and multiprocessing.parent_process() is None else None
+# shard workers re-import this module; only the parent keeps the normalizer debug log (workers would truncate/interleave it)
+NORMALIZE_DEBUG_LOG = "debug_class_replace_clean.csv" if multiprocessing.parent_process() is None else None
+normalizer = TextNormalizer("AllRelicNames.txt", "AllRelicAttributes.txt", fuzzy_cutoff=FUZZY_CUTOFF, memo_path=NORMALIZE_MEMO,
+                            debug_log_path=NORMALIZE_DEBUG_LOG)
 
 
 # === Regions ===
-ROIS = { 
+ROIS_1080P = { 
     # Works for 1080p:
     "name":  (770, 810, 1060, 1400),
     "slot1": (810, 880, 1105, 1700),
@@ -87,65 +135,106 @@ ROIS = {
     "slot3": (930, 1000, 1105, 1700),
 }
 
+def set_roi_scale(scale):
+    # Rebuilds ROIS / PANEL_ROI / SLOT_PITCH for a capture of height 1080 * scale
+    global ROI_SCALE, ROIS, PANEL_ROI, SLOT_PITCH
+    ROI_SCALE = scale
+    ROIS = {key: tuple(int(round(v * scale)) for v in region) for key, region in ROIS_1080P.items()}
+    PANEL_ROI = ( # whole relic panel: bounding box of the ROIS above, plus a line of headroom for rows pushed down by a wrap
+        min(r[0] for r in ROIS.values()), max(r[1] for r in ROIS.values()) + (ROIS["slot2"][0] - ROIS["slot1"][0]) // 2,
+        min(r[2] for r in ROIS.values()), max(r[3] for r in ROIS.values()),
+    )
+    SLOT_PITCH = ROIS["slot2"][0] - ROIS["slot1"][0] # vertical distance between attribute rows
+
+set_roi_scale(ROI_SCALE)
+
 
 # === Functions Start ===
-<<<<<<< HEAD
-def normalize_text(text):
-    if not text:
-        return ""
-    text = re.sub(r'\s{2,}', ' ', text)
-    replacements = {
-        "art'$": "art's",
-        "art’": "Art",  
-        "’": "'",
-        "armament'$": "armament's",
-        "armament' ": "armament's ",
-        "armament'": "armament's",
-        "armaments": "armament's",
-        "armament s": "armament's",
-        "armament'":"armament's",
-        "armament'ss":"armament's",
-        "armament$":"armament's",
-        "Fexpedition": "expedition",
-        "Fexpeditions": "expeditions",
-        "of. expedition":"of expedition",
-        "of, expedition":"of expedition",
-        "of = expedition":"of expedition",
-        "Endureat":"Endure at",
-        "Poison Moth Flightat": "Poison Moth Flight at",
-        "landing . critical":"landing a critical",
-        "landing : critical":"landing a critical",
-        "landing. critical":"landing a critical",
-        "etc:":"etc.",
-        "Two ~Handing":"Two-Handing",
-        "Fability":"ability",
-        "shop'":"shop",
-        "shop-":"shop",
-        "'shop":"shop",
-        "shop.":"shop",
-        "slecp":"sleep",
-        "slecp'":"sleep",
-        "'purchases":"purchases",
-        "'s $":"'s",
-        "'$":"'s",
-        "' $":"'s",
-        " $":"'s",
-        " ' ":" ",
-        "[[":"[",
-        "i5":"is",
-    }
-    for bad, good in replacements.items():
-        text = text.replace(bad, good)
-    return text.strip()
-
-
-=======
->>>>>>> threaded-gui
+def resize_for_ocr(img):
+    if OCR_SCALE == 1.0:
+        return img
+    return cv2.resize(img, None, fx=OCR_SCALE, fy=OCR_SCALE, interpolation=cv2.INTER_AREA)
+
+
+def get_reader():
+    global reader
+    if reader is None:
+        import easyocr # imported here so service-backed processes never load torch/easyocr
+        print("⏳ Loading easyocr model...")
+        reader = easyocr.Reader(['en'], gpu=True)
+    return reader
+
+
+def extract_texts_easyocr(imgs):
+    # Batch of crops -> texts; one round trip to the OCR service when it is running
+    texts = [""] * len(imgs)
+    todo = [i for i, img in enumerate(imgs) if img is not None and img.size > 0]
+    crops = [resize_for_ocr(imgs[i]) for i in todo]
+    results = ocr_client.read_texts(crops) if ocr_client is not None and crops else None
+    if results is None:
+        results = []
+        for crop in crops:
+            lines = get_reader().readtext(crop, detail=0, paragraph=True)
+            results.append(' '.join(lines).replace('\n', ' ').strip())
+    for i, text in zip(todo, results):
+        texts[i] = text
+    return texts
+
+
 def extract_text_easyocr(img):
+    return extract_texts_easyocr([img])[0]
+
+
+def extract_lines_easyocr(img):
+    # [(y_center, x_left, height, text), ...] one entry per detected text box, coords relative to img
     if img is None or img.size == 0:
-        return ""
-    results = reader.readtext(img, detail=0, paragraph=True)
-    return ' '.join(results).replace('\n', ' ').strip()
+        return []
+    crop = resize_for_ocr(img)
+    results = ocr_client.read_lines([crop]) if ocr_client is not None else None
+    if results is not None:
+        lines = results[0]
+    else:
+        lines = []
+        for box, text, _ in get_reader().readtext(crop, detail=1, paragraph=False):
+            xs = [p[0] for p in box]
+            ys = [p[1] for p in box]
+            lines.append(((min(ys) + max(ys)) / 2, min(xs), max(ys) - min(ys), text))
+    return [(y / OCR_SCALE, x / OCR_SCALE, height / OCR_SCALE, text) for y, x, height, text in lines]
+
+
+def assign_panel_lines(lines, panel_top=0, panel_left=0):
+    # Returns (name, slot1, slot2, slot3) raw text from the boxes of one panel readtext pass
+    # 1) boxes on the same baseline become one row (left to right)
+    name_top, name_bottom, _, name_right = ROIS["name"]
+    rows = [] # [y_center, [(x_left, text), ...]]
+    for y, x, height, text in sorted(lines):
+        if panel_top + y < name_bottom and panel_left + x >= name_right:
+            continue # right of the name ROI on the name row is not part of the name
+        if rows and abs(y - rows[-1][0]) < max(height, 1) / 2:
+            rows[-1][1].append((x, text))
+        else:
+            rows.append([y, [(x, text)]])
+    rows = [(panel_top + y, ' '.join(t for _, t in sorted(parts))) for y, parts in rows]
+
+    # 2) rows inside the name band are the name, the rest are attributes
+    name = ' '.join(text for y, text in rows if name_top <= y < name_bottom)
+
+    # 3) rows less than an attribute pitch below the attribute's first row are its wrapped continuation
+    slots = [] # [first_row_y, text]
+    for y, text in rows:
+        if y < name_bottom:
+            continue
+        if slots and y - slots[-1][0] < SLOT_PITCH * 0.75:
+            slots[-1][1] = f"{slots[-1][1]} {text}"
+        else:
+            slots.append([y, text])
+    slots = [text for _, text in slots[:3]] + [""] * max(0, 3 - len(slots))
+    return (name, *slots)
+
+
+ocr_backend = EasyOCRBackend(extract_texts_easyocr)
+if OCR_BACKEND == "template":
+    ocr_backend = TemplateOCRBackend(ocr_backend, template_path=OCR_TEMPLATES)
 
 
 def crop_frame(frame, region):
@@ -186,6 +275,103 @@ def load_relics_by_color(file_path):
     return relics_by_color
 
 
+# === Video Import ===
+def read_relic_text(frame, backend=None):
+    # raw (name, slot1, slot2, slot3) OCR text, before normalization
+    if PANEL_OCR:
+        return assign_panel_lines(extract_lines_easyocr(crop_frame(frame, PANEL_ROI)), panel_top=PANEL_ROI[0], panel_left=PANEL_ROI[2])
+    backend = backend or ocr_backend
+    return tuple(backend.read_many([crop_frame(frame, ROIS[key]) for key in ("name", "slot1", "slot2", "slot3")]))
+
+
+def read_relic(frame):
+    name, slot1, slot2, slot3 = (normalizer.normalize(text) for text in read_relic_text(frame))
+    return name, slot1, slot2, slot3
+
+
+def extract_relics(video_path, start_frame=0, end_frame=None, on_frame=None):
+    # Decodes frames (start_frame, end_frame] and returns unique relics as [(hash, row), ...] in first-seen order
+    # end_frame=None reads to EOF: CAP_PROP_FRAME_COUNT is only an estimate (variable frame rate captures)
+    cap = cv2.VideoCapture(str(video_path))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if height:
+        set_roi_scale(height / 1080) # ROIs follow the resolution of this recording, not whatever was calibrated
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame) # seek; frame_idx stays absolute so FRAME_SKIP samples the same frames as a full pass
+
+    relics = []
+    seen_hashes = set()
+    frame_idx = start_frame
+
+    while cap.isOpened() and (end_frame is None or frame_idx < end_frame):
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        frame_idx += 1
+        if on_frame is not None:
+            on_frame(frame_idx, total_frames)
+
+        if frame_idx % FRAME_SKIP != 0:
+            continue
+
+        name, slot1, slot2, slot3 = read_relic(frame)
+
+        relic_hash = hash_relic(name, slot1, slot2, slot3)
+        if relic_hash in seen_hashes:
+            continue
+
+        seen_hashes.add(relic_hash)
+        relics.append((relic_hash, {
+            "Name": name,
+            "Slot 1": slot1,
+            "Slot 2": slot2,
+            "Slot 3": slot3
+        }))
+
+    cap.release()
+    return relics
+
+
+def _extract_shard(video_path, start_frame, end_frame):
+    # Runs in a worker process; memo + OCR templates go back so the parent can persist what this shard learned
+    return extract_relics(video_path, start_frame, end_frame), normalizer.memo, ocr_backend.export_learned()
+
+
+def merge_shard_relics(shard_results):
+    # Shards are in time order, so the first occurrence of a hash is the first-seen relic.
+    # Relics straddling a boundary show up at the end of one shard and the start of the next.
+    relics = []
+    seen_hashes = set()
+    for shard_relics in shard_results:
+        for relic_hash, relic in shard_relics:
+            if relic_hash in seen_hashes:
+                continue
+            seen_hashes.add(relic_hash)
+            relics.append(relic)
+    return relics
+
+
+def extract_relics_sharded(video_path, total_frames, shard_count, on_shard_done=None):
+    bounds = [total_frames * i // shard_count for i in range(shard_count)] + [None] # last shard runs to EOF
+    ctx = multiprocessing.get_context("spawn") # forking a process that runs Tk threads is unsafe; spawn is also the Windows/macOS default
+    with ProcessPoolExecutor(max_workers=shard_count, mp_context=ctx) as pool:
+        futures = [pool.submit(_extract_shard, str(video_path), bounds[i], bounds[i + 1]) for i in range(shard_count)]
+        for done, _ in enumerate(as_completed(futures), start=1):
+            if on_shard_done is not None:
+                on_shard_done(done, shard_count)
+        shard_results = [future.result() for future in futures]
+
+    for _, memo, learned in shard_results:
+        for cleaned, hit in memo.items():
+            if cleaned not in normalizer.memo:
+                normalizer.memo[cleaned] = hit
+                normalizer.memo_dirty = True
+        ocr_backend.import_learned(learned)
+    return merge_shard_relics(relics for relics, _, _ in shard_results)
+
+
 
 class RelicSelector(tk.Tk):
     def __init__(self):
@@ -375,6 +561,7 @@ class RelicSelector(tk.Tk):
             return
 
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release() # decoding happens in extract_relics / extract_relics_sharded
         if total_frames == 0:
             self.after(0, lambda: messagebox.showerror("Error", "Video has 0 frames. Corrupt?"))
             self.after(0, lambda: self.update_button.config(state="normal"))
@@ -387,48 +574,30 @@ class RelicSelector(tk.Tk):
         if DEBUG and not os.path.exists(DEBUG_DIR):
             os.makedirs(DEBUG_DIR)
 
-        relics = []
-        seen_hashes = set()
-        frame_idx = 0
-
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame_idx += 1
-            progress = cap.get(cv2.CAP_PROP_POS_FRAMES) / total_frames * 100 # aka  frame_idx / total_frames * 100
-            safe_gui_update(progress, f"Processing frame {frame_idx}/{total_frames}\nfrom {self.video_path}")
-
-            if frame_idx % FRAME_SKIP != 0:
-                continue
-
-            # ---- Non-GUI work ----
-<<<<<<< HEAD
-            name = normalize_text(extract_text_easyocr(crop_frame(frame, ROIS["name"])))
-            slot1 = normalize_text(extract_text_easyocr(crop_frame(frame, ROIS["slot1"])))
-            slot2 = normalize_text(extract_text_easyocr(crop_frame(frame, ROIS["slot2"])))
-            slot3 = normalize_text(extract_text_easyocr(crop_frame(frame, ROIS["slot3"])))
-=======
-            name = normalizer.normalize(extract_text_easyocr(crop_frame(frame, ROIS["name"])))
-            slot1 = normalizer.normalize(extract_text_easyocr(crop_frame(frame, ROIS["slot1"])))
-            slot2 = normalizer.normalize(extract_text_easyocr(crop_frame(frame, ROIS["slot2"])))
-            slot3 = normalizer.normalize(extract_text_easyocr(crop_frame(frame, ROIS["slot3"])))
->>>>>>> threaded-gui
-
-            relic_hash = hash_relic(name, slot1, slot2, slot3)
-            if relic_hash in seen_hashes:
-                continue
+        if SHARD_COUNT > 1:
+            print(f"🧩 Splitting into {SHARD_COUNT} shards decoded in parallel...")
+            if USE_OCR_SERVICE:
+                print("ℹ️ Shards run their own in-process OCR (one model each) and do not use the OCR service")
+            try:
+                relics = extract_relics_sharded(self.video_path, total_frames, SHARD_COUNT,
+                    on_shard_done=lambda done, n: safe_gui_update(done / n * 100, f"Processed shard {done}/{n}\nfrom {self.video_path}"))
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"❌ Shard failed: {error}")
+                def handle_error():
+                    messagebox.showerror("Error", f"Failed to process video in parallel shards.\n{error}")
+                    self.progress_var.set(0)
+                    self.progress_bar.grid_remove()
+                    self.progress_text.grid_remove()
+                    self.update_button.config(state="normal")
+                self.after(0, handle_error)
+                return
+        else:
+            relics = [relic for _, relic in extract_relics(self.video_path,
+                on_frame=lambda frame_idx, total: safe_gui_update(min(frame_idx / total * 100, 100), f"Processing frame {frame_idx}/{total}\nfrom {self.video_path}"))]
 
-            seen_hashes.add(relic_hash)
-            relics.append({
-                "Name": name,
-                "Slot 1": slot1,
-                "Slot 2": slot2,
-                "Slot 3": slot3
-            })
-
-        cap.release()
+        normalizer.save_memo()
+        ocr_backend.save()
         safe_gui_update(100, f"Processing complete!  {len(relics)} relics found in {self.video_path},  Data saved to ./relics.csv") # last part of mp4 will be same relic, this updates pbar to go to 100%
         pd.DataFrame(relics).to_csv(OUTPUT_CSV, index=False)
         print(f"\n✅ Done! {len(relics)} unique relics saved to '{OUTPUT_CSV}'")
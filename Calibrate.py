@@ -0,0 +1,129 @@
+# Accuracy-vs-speed autotuner for the video import settings
+
+# usage:
+#   python Calibrate.py sample.mp4 sample_labels.csv [--target 0.98]
+#   sample_labels.csv : every relic shown in the clip, same columns as relics.csv (Name, Slot 1, Slot 2, Slot 3)
+# Each (ocr_backend, panel_ocr, ocr_scale) combination OCRs every frame of the clip once and is timed, frame_skip and
+# fuzzy_cutoff are then replayed from those cached reads. The template backend starts from the user's current
+# OCR_TEMPLATES (read-only, never saved back) and learns as it goes within that one timed pass, exactly like the next
+# import would, so its estimate is for the store as it is today: it gets faster as more imports fill the store, and with
+# an empty store it reflects a first import. The fastest settings that still reach --target accuracy are
+# saved to BetterRelics.IMPORT_PROFILE, which the import path loads on startup. ROI scale is not part of the profile,
+# imports take it from each video's height.
+import argparse
+import json
+import time
+import csv
+import cv2
+import BetterRelics as br
+from OCRBackends import EasyOCRBackend, TemplateOCRBackend
+from TextNormalizer import TextNormalizer
+
+# search space
+FRAME_SKIPS = [1, 2, 3, 4, 6, 8]
+FUZZY_CUTOFFS = [75, 80, 85, 90, 95]
+OCR_SCALES = [0.5, 0.75, 1.0]
+PIPELINES = [ # (ocr_backend, panel_ocr); panel OCR calls easyocr directly, so it has no template variant
+    ("easyocr", False),
+    ("easyocr", True),
+    ("template", False),
+]
+
+
+def load_labels(path):
+    delimiter = br.detect_delimiter(path)
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = [row for row in csv.reader(f, delimiter=delimiter) if row]
+    if rows and rows[0][0].strip() == "Name":
+        rows = rows[1:] # header
+    return {br.hash_relic(*(row + [""] * 4)[:4]) for row in rows}
+
+
+def read_clip(video_path, backend):
+    # OCR every frame once -> ([raw texts per frame], decode seconds/frame, ocr seconds/frame)
+    cap = cv2.VideoCapture(str(video_path))
+    reads = []
+    decode_time = ocr_time = 0.0
+    while cap.isOpened():
+        t0 = time.perf_counter()
+        ret, frame = cap.read()
+        t1 = time.perf_counter()
+        if not ret:
+            break
+        reads.append(br.read_relic_text(frame, backend))
+        decode_time += t1 - t0
+        ocr_time += time.perf_counter() - t1
+    cap.release()
+    n = max(len(reads), 1)
+    return reads, decode_time / n, ocr_time / n
+
+
+def first_name_crop(video_path):
+    cap = cv2.VideoCapture(str(video_path))
+    ret, frame = cap.read()
+    cap.release()
+    return br.crop_frame(frame, br.ROIS["name"]) if ret else None
+
+
+def relic_accuracy(found, labels):
+    # penalizes both missed and spurious relics
+    return len(found & labels) / max(len(found), len(labels), 1)
+
+
+def calibrate(video_path, labels_path, target):
+    labels = load_labels(labels_path)
+    cap = cv2.VideoCapture(str(video_path))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    if not height:
+        raise SystemExit(f"❌ Could not open '{video_path}'")
+    br.set_roi_scale(height / 1080)
+    br.extract_texts_easyocr([first_name_crop(video_path)]) # untimed: loads the lazy reader (or connects to the service) before any pass is timed
+    normalizers = {cutoff: TextNormalizer("AllRelicNames.txt", "AllRelicAttributes.txt", fuzzy_cutoff=cutoff)
+                   for cutoff in FUZZY_CUTOFFS}
+
+    results = []
+    for ocr_backend, panel_ocr in PIPELINES:
+        for ocr_scale in OCR_SCALES:
+            br.PANEL_OCR = panel_ocr
+            br.OCR_SCALE = ocr_scale
+            backend = EasyOCRBackend(br.extract_texts_easyocr)
+            if ocr_backend == "template":
+                backend = TemplateOCRBackend(backend, template_path=br.OCR_TEMPLATES) # seeded from the user's store, save() is never called
+            reads, decode_time, ocr_time = read_clip(video_path, backend)
+            print(f"📏 ocr_backend={ocr_backend} panel_ocr={panel_ocr} ocr_scale={ocr_scale}: {ocr_time * 1000:.1f} ms OCR/frame over {len(reads)} frames")
+            for cutoff, normalizer in normalizers.items():
+                hashes = [br.hash_relic(*(normalizer.normalize(text) for text in texts)) for texts in reads]
+                for frame_skip in FRAME_SKIPS:
+                    sampled = hashes[frame_skip - 1::frame_skip] # same frames as extract_relics: frame_idx % FRAME_SKIP == 0
+                    results.append({
+                        "frame_skip": frame_skip,
+                        "fuzzy_cutoff": cutoff,
+                        "ocr_scale": ocr_scale,
+                        "panel_ocr": panel_ocr,
+                        "ocr_backend": ocr_backend,
+                        "accuracy": relic_accuracy(set(sampled), labels),
+                        "seconds": decode_time * len(reads) + ocr_time * len(sampled), # estimated import time of the clip
+                    })
+
+    passing = [r for r in results if r["accuracy"] >= target]
+    if passing:
+        best = min(passing, key=lambda r: r["seconds"])
+    else:
+        best = max(results, key=lambda r: (r["accuracy"], -r["seconds"]))
+        print(f"⚠️ No settings reached {target:.0%} accuracy, saving the most accurate ({best['accuracy']:.1%})")
+    return dict(best, target=target, clip=str(video_path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the fastest import settings that reach a target relic accuracy.")
+    parser.add_argument("video", help="short sample recording of the Sell screen")
+    parser.add_argument("labels", help="CSV of the relics in the sample (Name, Slot 1, Slot 2, Slot 3)")
+    parser.add_argument("--target", type=float, default=0.98, help="minimum relic accuracy (0-1)")
+    parser.add_argument("--output", default=str(br.IMPORT_PROFILE), help="where to save the profile")
+    args = parser.parse_args()
+
+    profile = calibrate(args.video, args.labels, args.target)
+    with open(args.output, "w", encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+    print(f"✅ Saved import profile to '{args.output}':\n{json.dumps(profile, indent=2)}")
@@ -0,0 +1,223 @@
+# OCR backends used by the video import loop
+
+# backends:
+#   EasyOCRBackend     : neural detector/recognizer pass via a batch text-extraction function (extract_texts_easyocr)
+#   TemplateOCRBackend : learned line templates matched on binarized text pixels, falls back when unsure
+# hyperparameters (TemplateOCRBackend):
+#   max_glyph_diff   : max fraction of differing text pixels in any glyph-wide window to accept a match
+#   max_key_distance : thumbnail bits (of 512) a candidate may differ by before it is even verified
+#   max_per_label    : templates kept per text (jitter variants), least-hit one evicted when full
+#   max_templates    : total templates kept, least-hit one evicted when full
+import json
+import os
+import numpy as np
+import cv2
+
+
+class OCRBackend:
+    def read(self, img):
+        return self.read_many([img])[0]
+
+    def read_many(self, imgs):
+        raise NotImplementedError
+
+    def save(self):
+        pass
+
+    def export_learned(self): # anything learned this run, picklable (sent back from shard processes)
+        return []
+
+    def import_learned(self, learned):
+        pass
+
+
+class EasyOCRBackend(OCRBackend):
+    def __init__(self, extract_fn):
+        self.extract_fn = extract_fn
+
+    def read_many(self, imgs):
+        return self.extract_fn(imgs)
+
+
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16) # set bits per byte, for Hamming distances
+
+
+class TemplateOCRBackend(OCRBackend):
+    # A crop is reduced to its binarized text pixels, cropped to their bounding box (the "mask").
+    # Candidates come from the mask's size bucket (and its neighbours) whose coarse thumbnail is within
+    # max_key_distance bits; one is only accepted if no glyph-wide window of the two masks differs by more than
+    # max_glyph_diff, so "+1" vs "+2" is a miss, not a match.
+    KEY_SIZE = (64, 8) # (w, h) in cv2 order, coarse thumbnail used to pre-filter candidates
+    FORMAT_VERSION = 3 # bump when the mask/key format changes, older template files are relearned
+
+    def __init__(self, fallback, template_path=None, max_glyph_diff=0.10, max_key_distance=48,
+                 max_per_label=8, max_templates=5000):
+        self.fallback = fallback
+        self.template_path = template_path
+        self.max_glyph_diff = max_glyph_diff
+        self.max_key_distance = max_key_distance
+        self.max_per_label = max_per_label
+        self.max_templates = max_templates
+
+        self.templates = {}     # id -> [text, size_key, thumb, mask, hits]
+        self.buckets = {}       # size_key -> [id, ...]
+        self.label_ids = {}     # text -> [id, ...]
+        self.next_id = 0
+        self.learned = []       # (text, size_key, thumb, mask) added this run
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _features(self, img):
+        # -> (size_key, thumb, mask) or None for a crop without any text pixels
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        mask = binary > 0
+        if mask.mean() > 0.5:
+            mask = ~mask # text is the minority class whatever the colors
+        rows = np.flatnonzero(mask.any(axis=1))
+        cols = np.flatnonzero(mask.any(axis=0))
+        if rows.size == 0:
+            return None
+        mask = mask[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+        thumb = np.packbits(cv2.resize(mask.astype(np.uint8) * 255, self.KEY_SIZE, interpolation=cv2.INTER_AREA) > 127)
+        return (mask.shape[0] // 4, mask.shape[1] // 8), thumb, mask
+
+    def _glyph_diff_ok(self, a, b):
+        diff = (a ^ b).sum(axis=0).astype(np.float32) # differing pixels per column
+        window = max(a.shape[0] // 2, 1) # about one glyph wide
+        if diff.size > window:
+            diff = np.convolve(diff, np.ones(window, np.float32), mode='valid')
+        return diff.max() <= self.max_glyph_diff * window * a.shape[0]
+
+    def _verify(self, mask, template):
+        if mask.shape == template.shape:
+            return self._glyph_diff_ok(mask, template)
+        dh, dw = template.shape[0] - mask.shape[0], template.shape[1] - mask.shape[1]
+        if abs(dh) > 2 or abs(dw) > 2:
+            return False
+        # bounding boxes off by a pixel or two (edge noise): try the alignments on a shared canvas
+        h, w = max(mask.shape[0], template.shape[0]) + 2, max(mask.shape[1], template.shape[1]) + 2
+        a = np.zeros((h, w), bool)
+        a[1:1 + mask.shape[0], 1:1 + mask.shape[1]] = mask
+        for oy in range(0, h - template.shape[0] + 1):
+            for ox in range(0, w - template.shape[1] + 1):
+                b = np.zeros((h, w), bool)
+                b[oy:oy + template.shape[0], ox:ox + template.shape[1]] = template
+                if self._glyph_diff_ok(a, b):
+                    return True
+        return False
+
+    def _candidates(self, size_key, thumb):
+        # ids in this and neighbouring size buckets whose thumbnail is close, nearest first
+        kh, kw = size_key
+        ids = [i for dh in (-1, 0, 1) for dw in (-1, 0, 1) for i in self.buckets.get((kh + dh, kw + dw), ())]
+        if not ids:
+            return []
+        thumbs = np.stack([self.templates[i][2] for i in ids])
+        dist = POPCOUNT[thumbs ^ thumb].sum(axis=1)
+        order = np.argsort(dist, kind='stable')
+        return [(ids[j], int(dist[j])) for j in order if dist[j] <= self.max_key_distance]
+
+    def _match(self, size_key, thumb, mask):
+        for idx, _ in self._candidates(size_key, thumb):
+            template = self.templates[idx]
+            if self._verify(mask, template[3]):
+                template[4] += 1
+                return template[0]
+        return None
+
+    def _evict(self, idx):
+        text, size_key = self.templates.pop(idx)[:2]
+        self.buckets[size_key].remove(idx)
+        self.label_ids[text].remove(idx)
+
+    def _add(self, text, size_key, thumb, mask, hits=0):
+        candidates = self._candidates(size_key, thumb)
+        if candidates and candidates[0][1] == 0 and self.templates[candidates[0][0]][0] == text:
+            return False # nearest template already has this label and the same thumbnail: near-duplicate
+        # full: drop the least-hit (then oldest) template of this label, or overall, instead of refusing new variants
+        same_label = self.label_ids.get(text, [])
+        if len(same_label) >= self.max_per_label:
+            self._evict(min(same_label, key=lambda i: (self.templates[i][4], i)))
+        elif len(self.templates) >= self.max_templates:
+            self._evict(min(self.templates, key=lambda i: (self.templates[i][4], i)))
+        idx = self.next_id
+        self.next_id += 1
+        self.templates[idx] = [text, size_key, thumb, mask, hits]
+        self.buckets.setdefault(size_key, []).append(idx)
+        self.label_ids.setdefault(text, []).append(idx)
+        return True
+
+    def read_many(self, imgs):
+        results = [""] * len(imgs)
+        misses = []
+        for i, img in enumerate(imgs):
+            if img is None or img.size == 0:
+                continue
+            features = self._features(img)
+            text = None if features is None else self._match(*features)
+            if text is None:
+                misses.append((i, features))
+            else:
+                results[i] = text
+                self.hits += 1
+
+        if misses:
+            self.misses += len(misses)
+            texts = self.fallback.read_many([imgs[i] for i, _ in misses])
+            for (i, features), text in zip(misses, texts):
+                results[i] = text
+                if features is not None and self._add(text, *features): # easyocr result becomes the label for this crop
+                    self.learned.append((text, *features))
+                    self.dirty = True
+        return results
+
+    def export_learned(self):
+        return self.learned
+
+    def import_learned(self, learned):
+        for text, size_key, thumb, mask in learned:
+            if self._add(text, size_key, thumb, mask):
+                self.dirty = True
+
+    def _load(self):
+        if not self.template_path or not os.path.exists(self.template_path):
+            return
+        try:
+            with np.load(self.template_path) as data:
+                if int(data["version"]) != self.FORMAT_VERSION:
+                    raise ValueError("template format changed")
+                texts = json.loads(str(data["texts"]))
+                size_keys = data["size_keys"]
+                thumbs = data["thumbs"]
+                shapes = data["shapes"]
+                hits = data["hits"]
+                bits = np.unpackbits(data["masks"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"♻️ OCR templates '{self.template_path}' not loaded, relearning: {e}")
+            return
+        offset = 0
+        for text, (kh, kw), thumb, (h, w), n in zip(texts, size_keys, thumbs, shapes, hits):
+            mask = bits[offset:offset + h * w].reshape((h, w)).astype(bool)
+            offset += h * w
+            self._add(text, (int(kh), int(kw)), thumb.copy(), mask, int(n))
+
+    def save(self):
+        print(f"🔤 Template OCR: {self.hits} matched, {self.misses} sent to fallback, {len(self.templates)} templates")
+        if not self.template_path or not self.dirty: # only rewritten when this run learned something new
+            return
+        records = list(self.templates.values())
+        tmp_path = f"{self.template_path}.tmp.npz"
+        np.savez_compressed(tmp_path,
+            version=np.array(self.FORMAT_VERSION),
+            texts=np.array(json.dumps([r[0] for r in records])),
+            size_keys=np.array([r[1] for r in records], dtype=np.int32).reshape(-1, 2),
+            thumbs=np.array([r[2] for r in records], dtype=np.uint8).reshape(len(records), -1),
+            shapes=np.array([r[3].shape for r in records], dtype=np.int32).reshape(-1, 2),
+            hits=np.array([r[4] for r in records], dtype=np.int64),
+            masks=np.packbits(np.concatenate([r[3].ravel() for r in records]) if records else np.zeros(0, bool)))
+        os.replace(tmp_path, self.template_path)
+        self.dirty = False
+        self.learned = []
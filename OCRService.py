@@ -0,0 +1,188 @@
+# Long-lived local OCR service: keeps one easyocr.Reader loaded so imports skip the model load
+
+# usage:
+#   python OCRService.py [--readers N]   # serve on 127.0.0.1:OCR_SERVICE_PORT until Ctrl+C
+# BetterRelics.py talks to it through OCRClient and falls back to in-process OCR when it is not running.
+# Each request holds one of the N loaded readers while it runs, so N requests are OCR'd at once (default 1).
+# protocol (little-endian, one persistent connection per client, any number of requests):
+#   request  : MAGIC, op (OP_TEXT | OP_LINES), crop count, then per crop: h, w, channels, raw uint8 pixels
+#   response : crop count, then per crop
+#              OP_TEXT  -> utf-8 length, text                       (same as extract_text_easyocr)
+#              OP_LINES -> box count, then per box y_center, x_left, height, utf-8 length, text
+import socketserver
+import threading
+import argparse
+import queue
+import os
+import socket
+import struct
+import time
+import numpy as np
+
+OCR_SERVICE_HOST = "127.0.0.1"
+OCR_SERVICE_PORT = 47231
+MAGIC = b"BROC"
+OP_TEXT = 0
+OP_LINES = 1
+
+REQUEST_HEADER = struct.Struct("<4sBI")
+CROP_HEADER = struct.Struct("<HHB")
+COUNT = struct.Struct("<I")
+BOX_HEADER = struct.Struct("<fffI")
+
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if k == 0:
+            raise ConnectionError("OCR service connection closed")
+        got += k
+    return buf
+
+
+def _pack_text(text):
+    data = text.encode('utf-8')
+    return COUNT.pack(len(data)) + data
+
+
+def _unpack_text(sock):
+    (length,) = COUNT.unpack(_recv_exact(sock, COUNT.size))
+    return bytes(_recv_exact(sock, length)).decode('utf-8')
+
+
+# === Server ===
+class OCRRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        while True:
+            try:
+                magic, op, count = REQUEST_HEADER.unpack(_recv_exact(sock, REQUEST_HEADER.size))
+                if magic != MAGIC:
+                    return
+                crops = []
+                for _ in range(count):
+                    h, w, c = CROP_HEADER.unpack(_recv_exact(sock, CROP_HEADER.size))
+                    pixels = np.frombuffer(_recv_exact(sock, h * w * c), dtype=np.uint8)
+                    crops.append(pixels.reshape((h, w, c)) if c > 1 else pixels.reshape((h, w)))
+            except (OSError, ConnectionError):
+                return # client hung up
+
+            reply = [COUNT.pack(count)]
+            reader = self.server.readers.get() # wait for a free reader, requests beyond the pool size queue here
+            try:
+                for crop in crops:
+                    if op == OP_TEXT:
+                        results = reader.readtext(crop, detail=0, paragraph=True)
+                        reply.append(_pack_text(' '.join(results).replace('\n', ' ').strip()))
+                    else:
+                        boxes = reader.readtext(crop, detail=1, paragraph=False)
+                        reply.append(COUNT.pack(len(boxes)))
+                        for box, text, _ in boxes:
+                            xs = [p[0] for p in box]
+                            ys = [p[1] for p in box]
+                            data = text.encode('utf-8')
+                            reply.append(BOX_HEADER.pack((min(ys) + max(ys)) / 2, min(xs), max(ys) - min(ys), len(data)) + data)
+            finally:
+                self.server.readers.put(reader)
+            sock.sendall(b"".join(reply))
+
+
+class OCRServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = os.name != "nt" # SO_REUSEADDR on Windows lets a second service bind the same port silently
+    daemon_threads = True
+
+    def __init__(self, address, readers):
+        super().__init__(address, OCRRequestHandler)
+        self.readers = queue.Queue() # pool of loaded easyocr.Reader, one per concurrent request
+        for reader in readers:
+            self.readers.put(reader)
+
+
+# === Client ===
+class OCRClient:
+    def __init__(self, host=OCR_SERVICE_HOST, port=OCR_SERVICE_PORT, connect_timeout=0.2, request_timeout=120.0, retry_after=30.0):
+        self.address = (host, port)
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout # generous, but a hung service must not block the import forever
+        self.retry_after = retry_after # seconds to wait before trying again once the service was unreachable
+        self.sock = None
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        if self.sock is not None:
+            return True
+        if time.monotonic() < self.retry_at:
+            return False
+        try:
+            self.sock = socket.create_connection(self.address, timeout=self.connect_timeout)
+            self.sock.settimeout(self.request_timeout) # a timeout raises OSError -> in-process fallback below
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            print(f"🔌 Using OCR service at {self.address[0]}:{self.address[1]}")
+            return True
+        except OSError:
+            self.retry_at = time.monotonic() + self.retry_after
+            return False
+
+    def _request(self, op, crops):
+        # Returns None when the service is unavailable so callers can fall back to in-process OCR
+        with self.lock:
+            if not self._connect():
+                return None
+            parts = [REQUEST_HEADER.pack(MAGIC, op, len(crops))]
+            for crop in crops:
+                crop = np.ascontiguousarray(crop, dtype=np.uint8)
+                channels = crop.shape[2] if crop.ndim == 3 else 1
+                parts.append(CROP_HEADER.pack(crop.shape[0], crop.shape[1], channels))
+                parts.append(crop.data) # raw pixels, no encode/decode cost on either side
+            try:
+                self.sock.sendall(b"".join(parts))
+                (count,) = COUNT.unpack(_recv_exact(self.sock, COUNT.size))
+                if op == OP_TEXT:
+                    return [_unpack_text(self.sock) for _ in range(count)]
+                results = []
+                for _ in range(count):
+                    (n_boxes,) = COUNT.unpack(_recv_exact(self.sock, COUNT.size))
+                    lines = []
+                    for _ in range(n_boxes):
+                        y, x, height, length = BOX_HEADER.unpack(_recv_exact(self.sock, BOX_HEADER.size))
+                        lines.append((y, x, height, bytes(_recv_exact(self.sock, length)).decode('utf-8')))
+                    results.append(lines)
+                return results
+            except (OSError, ConnectionError, struct.error) as e:
+                print(f"⚠️ OCR service request failed, falling back to in-process OCR: {e}")
+                self.close()
+                return None
+
+    def read_texts(self, crops):
+        return self._request(OP_TEXT, crops)
+
+    def read_lines(self, crops):
+        return self._request(OP_LINES, crops)
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep easyocr loaded for BetterRelics imports.")
+    parser.add_argument("--readers", type=int, default=1, help="models to load, i.e. requests OCR'd in parallel")
+    args = parser.parse_args()
+
+    import easyocr
+    print(f"⏳ Loading {max(args.readers, 1)} easyocr model(s)...")
+    readers = [easyocr.Reader(['en'], gpu=True) for _ in range(max(args.readers, 1))]
+    with OCRServer((OCR_SERVICE_HOST, OCR_SERVICE_PORT), readers) as server:
+        print(f"✅ OCR service listening on {OCR_SERVICE_HOST}:{OCR_SERVICE_PORT} with {len(readers)} reader(s) (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -2,7 +2,12 @@
 
 # hyperparameters: 
 #   fuzzy_cutoff : text match cutoff %
+#   memo_path    : optional JSON file persisting {cleaned text: [match, score]} across runs
+#   debug_log_path : CSV truncated on init and appended per normalize() when DEBUG, None = no log
+import os
 import re
+import json
+import hashlib
 from rapidfuzz import process
 from functools import lru_cache
 
@@ -11,7 +16,7 @@ if DEBUG:
     import csv
 
 class TextNormalizer:
-    def __init__(self, name_file, attribute_file, fuzzy_cutoff=85):
+    def __init__(self, name_file, attribute_file, fuzzy_cutoff=85, memo_path=None, debug_log_path="debug_class_replace_clean.csv"):
         self.fuzzy_cutoff = fuzzy_cutoff
         self.valid_entries = self._load_entries(name_file, attribute_file)
         # self.valid_entries_set = set(self.valid_entries) # sets are O(1) lookup vs O(n) for lists # not hashable so cannot use for lru_cache
@@ -67,29 +72,53 @@ class TextNormalizer:
             "abiliry":"ability",
             "[Revenant ":"[Revenant] ",
         }
+        self.valid_entries_tuple = tuple(self.valid_entries) # Cache-safe: tuple is hashable, list is not
 
-        self.debug_log_path = "debug_class_replace_clean.csv"
-        if DEBUG:
+        # Persistent memo (cleaned OCR text -> (match, score)), survives between runs unlike the lru_cache
+        self.memo_path = memo_path
+        self.fingerprint = self._fingerprint()
+        self.memo = self._load_memo()
+        self.memo_dirty = False
+
+        self.debug_log_path = debug_log_path
+        if DEBUG and self.debug_log_path:
             with open(self.debug_log_path, "w", newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
                 writer.writerow(["Raw Input", "Cleaned Input", "Matched Output", "Match Score"])
 
-    @staticmethod
-    @lru_cache(maxsize=2048)
-    def _normalize_cached(cleaned, valid_entries_tuple, fuzzy_cutoff):
-        # exact match first
-        valid_entries = list(valid_entries_tuple)
-        valid_set = set(valid_entries)
-        if cleaned in valid_set:
-            return cleaned
-
-        match = process.extractOne(
-            cleaned,
-            valid_entries,
-            processor=None,
-            score_cutoff=fuzzy_cutoff
-        )
-        return match[0] if match else cleaned
+    def _fingerprint(self):
+        # anything that can change a match result invalidates the memo
+        h = hashlib.sha256()
+        h.update("\n".join(self.valid_entries).encode('utf-8'))
+        h.update(json.dumps(self.replacements, sort_keys=True).encode('utf-8'))
+        h.update(str(self.fuzzy_cutoff).encode('utf-8'))
+        return h.hexdigest()
+
+    def _load_memo(self):
+        if not self.memo_path:
+            return {}
+        try:
+            with open(self.memo_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or not isinstance(data.get("entries"), dict):
+            print(f"♻️ Normalizer memo '{self.memo_path}' is not a memo file, rebuilding")
+            return {}
+        if data.get("fingerprint") != self.fingerprint:
+            print(f"♻️ Normalizer memo '{self.memo_path}' is stale (dictionary/rules/cutoff changed), rebuilding")
+            return {}
+        return {cleaned: tuple(hit) for cleaned, hit in data["entries"].items()
+                if isinstance(hit, list) and len(hit) == 2 and isinstance(hit[0], str)}
+
+    def save_memo(self):
+        if not self.memo_path or not self.memo_dirty:
+            return
+        tmp_path = f"{self.memo_path}.tmp"
+        with open(tmp_path, "w", encoding='utf-8') as f:
+            json.dump({"fingerprint": self.fingerprint, "entries": self.memo}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.memo_path) # atomic swap so a crash mid-write keeps the old memo
+        self.memo_dirty = False
 
     def _load_entries(self, name_file, attribute_file):
         names = self._read_file(name_file)
@@ -125,25 +154,27 @@ class TextNormalizer:
         #     result = process.extractOne(cleaned, self.valid_entries_set, processor=None, score_cutoff=self.fuzzy_cutoff) # default scorer=fuzz.ratio
         #     match = result[0] if result else cleaned
 
-        # Cache-safe: tuple is hashable, list is not
-        valid_entries_tuple = tuple(self.valid_entries)
-        # match = self._normalize_cached(cleaned, valid_entries_tuple, self.fuzzy_cutoff)
+        # Persistent memo first, fall back to (lru-cached) fuzzy matching and remember the result
+        hit = self.memo.get(cleaned)
+        if hit is not None:
+            match, score = hit
+        else:
+            match, score = self._normalize_cached(cleaned, self.valid_entries_tuple, self.fuzzy_cutoff)
+            self.memo[cleaned] = (match, score)
+            self.memo_dirty = True
 
         # Log if debug enabled
-        if DEBUG:
-            match, score = self._normalize_cached_DEBUG(cleaned, valid_entries_tuple, self.fuzzy_cutoff)
+        if DEBUG and self.debug_log_path:
             with open(self.debug_log_path, "a", newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
                 writer.writerow([raw_input, cleaned, match, score])
-        else: # not in debug
-            match = self._normalize_cached(cleaned, valid_entries_tuple, self.fuzzy_cutoff)
 
         return match
 
 
     @staticmethod
     @lru_cache(maxsize=2048)
-    def _normalize_cached_DEBUG(cleaned, valid_entries_tuple, fuzzy_cutoff):
+    def _normalize_cached(cleaned, valid_entries_tuple, fuzzy_cutoff):
         # exact match first
         valid_entries = list(valid_entries_tuple)
         valid_set = set(valid_entries)